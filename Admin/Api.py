@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from fastapi import APIRouter
 from db import get_db
 
 router = APIRouter()
 
 class AdminLoginRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     username: str
     password: str
 
@@ -1,15 +1,86 @@
 from fastapi import FastAPI, WebSocket, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# Log records go through a queue so stdout writes happen on a background
+# thread instead of blocking the event loop (stdout is a pipe under Docker).
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+
+logger = logging.getLogger(__name__)
+logger.addHandler(QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+logger.propagate = False
 
 app = FastAPI()
-clients = {}
 
-@app.get("/")
-async def get(request: Request, call_id: Optional[str] = None):
-    if call_id not in ["1", "2"]:
-        return HTMLResponse("<h2>Invalid or missing call ID. Use ?call_id=1 or ?call_id=2</h2>")
+# Exactly two peers per call (?call_id=1 or 2), so the in-process relay keeps
+# them in a two-slot list: slot 0 is peer "1", slot 1 is peer "2", and the
+# other side is always idx ^ 1. No dict hashing or string building per frame.
+slots: list = [None, None]
+
+# When REDIS_URL is set (and redis is installed) the relay goes through
+# Redis pub/sub, so the two peers can land on different workers/pods.
+# Without it we fall back to the single-process clients dict.
+REDIS_URL = os.getenv("REDIS_URL")
+_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(REDIS_URL)
+    return _redis
+
+# Matches the signaling types the clients send (offer/answer/ice) near the
+# start of the frame, so we can route without a full JSON parse.
+_TYPE_SNIFF = re.compile(r'"type"\s*:\s*"(offer|answer|ice)"')
+_TYPE_SNIFF_BYTES = re.compile(rb'"type"\s*:\s*"(offer|answer|ice)"')
+
+
+def sniff_message_type(data) -> Optional[str]:
+    """Peek at the signaling message type without parsing the whole frame."""
+    if isinstance(data, (bytes, bytearray)):
+        match = _TYPE_SNIFF_BYTES.search(data)
+        return match.group(1).decode("ascii") if match else None
+    match = _TYPE_SNIFF.search(data)
+    return match.group(1) if match else None
+
+
+def parse_frame(data):
+    """Full JSON parse of a frame. Only call this when a handler actually
+    needs a field from the message (auth/rate-limit hooks etc.)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Prebuilt once so bad requests don't allocate a new response each time.
+_INVALID_CALL_ID_RESP = Response(
+    content=b"<h2>Invalid or missing call ID. Use ?call_id=1 or ?call_id=2</h2>",
+    media_type="text/html",
+    status_code=400,
+)
 
+
+def _render_call_page(call_id: str) -> HTMLResponse:
     html_content = f"""
     <!DOCTYPE html>
     <html>
@@ -106,16 +177,84 @@ async def get(request: Request, call_id: Optional[str] = None):
     """
     return HTMLResponse(content=html_content)
 
+# Only two valid pages exist, so render both once at import; each GET then
+# returns prebuilt bytes with no f-string build or UTF-8 encode per hit.
+_CALL_PAGES = {cid: _render_call_page(cid) for cid in ("1", "2")}
+
+
+@app.get("/")
+async def get(request: Request, call_id: Optional[str] = None):
+    page = _CALL_PAGES.get(call_id)
+    if page is None:
+        return _INVALID_CALL_ID_RESP
+    return page
+
+async def relay_via_redis(websocket: WebSocket, call_id: str):
+    """Relay frames over Redis pub/sub channels keyed by call_id."""
+    redis_conn = get_redis()
+    target_id = "2" if call_id == "1" else "1"
+    pubsub = redis_conn.pubsub()
+    await pubsub.subscribe(f"call:{call_id}")
+
+    async def forward_from_redis():
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                await websocket.send_text(data)
+
+    forwarder = asyncio.create_task(forward_from_redis())
+    try:
+        while True:
+            data = await websocket.receive_text()
+            await redis_conn.publish(f"call:{target_id}", data)
+    except Exception:
+        pass
+    finally:
+        forwarder.cancel()
+        await pubsub.unsubscribe(f"call:{call_id}")
+        await pubsub.aclose()
+
+
 @app.websocket("/ws/{call_id}")
 async def websocket_endpoint(websocket: WebSocket, call_id: str):
     await websocket.accept()
-    clients[call_id] = websocket
+    if call_id not in ("1", "2"):
+        await websocket.close(code=1008)
+        return
+    if aioredis is not None and REDIS_URL:
+        await relay_via_redis(websocket, call_id)
+        return
+    idx = int(call_id) - 1
+    peer_idx = idx ^ 1
+    slots[idx] = websocket
+    logger.info("Call peer %s connected", call_id)
     try:
         while True:
-            data = await websocket.receive_text()
-            target_id = "2" if call_id == "1" else "1"
-            if target_id in clients:
-                await clients[target_id].send_text(data)
+            # Raw ASGI event: the frame payload is re-emitted as-is, with no
+            # str decode/encode round-trip for data we never inspect.
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("text")
+            if data is None:
+                data = message.get("bytes")
+            peer = slots[peer_idx]
+            if peer is not None:
+                event = {"type": "websocket.send"}
+                if message.get("text") is not None:
+                    event["text"] = message["text"]
+                else:
+                    event["bytes"] = message["bytes"]
+                await peer.send(event)
+                if logger.isEnabledFor(logging.DEBUG):
+                    # Sniff the type cheaply, never full-parse here. Handlers
+                    # that need message fields should go through parse_frame().
+                    logger.debug("Forwarded %s frame from peer %s", sniff_message_type(data), call_id)
     except Exception:
-        clients.pop(call_id, None)
+        pass
+    finally:
+        slots[idx] = None
+        logger.info("Call peer %s disconnected", call_id)
 
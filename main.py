@@ -1,3 +1,15 @@
+import os
+
+# Swap in libuv's event loop before any loop is created; the handlers are
+# pure I/O, where uvloop is 2-4x faster than the stdlib selector loop.
+# Optional so dev boxes without the wheel still run.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+import uvicorn
 from fastapi import FastAPI, Request, Body
 from pydantic import BaseModel
 from SuperAdmin import Api as superadmin_api
@@ -7,7 +19,7 @@ from Admin.Api import AdminLoginRequest, AdminLoginRequest
 from Admin import Api as admin_api
 from Student import Api as student_api
 from fastapi.middleware.cors import CORSMiddleware
-from websocket_demo import app as websocket_app
+from websocket_demo import app as websocket_app, start_background_workers, ensure_indexes
 from db import get_db
 from call import app as call_app
 
@@ -22,6 +34,14 @@ app.add_middleware(
     allow_headers=["*"],              # 👈 Allow all headers
 )
 
+@app.on_event("startup")
+async def _start_mounted_app_workers():
+    # Mounted sub-apps never get lifespan events, so the write-queue
+    # flushers, reapers, and index builds in websocket_demo must be
+    # started from here.
+    await start_background_workers()
+    await ensure_indexes()
+
 @app.get("/")
 def read_root():
     return {"message": "Student Management API is running."}
@@ -31,7 +51,8 @@ class LoginRequest(BaseModel):
     password: str
 
 @app.post("/login")
-def login(request: LoginRequest):
+def login(request: dict = Body(...)):
+    # Stub endpoint: no point paying Pydantic validation for a static reply.
     # Here you would check the username and password against your database or authentication service
     print("Login API is working.")
     # Dummy logic: always return success for demonstration
@@ -61,4 +82,31 @@ def main():
 # Main entry point
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 10000))  # Use Render's PORT or default to 10000 locally
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Single worker by default: user_connections/call_connections/
+    # active_calls (and call.py's slots) are per-process, and uvicorn
+    # workers share one listening socket with OS-level accept
+    # distribution — nothing in this topology can keep two call peers on
+    # the same worker. Only raise WEB_CONCURRENCY once the registries
+    # have a cross-worker path (the /call relay already does via Redis).
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        loop="uvloop",
+        http="httptools",
+        # permessage-deflate halves SDP offers (2-5 KB) and /chat-history
+        # style multi-KB frames on the wire; tiny chat/ICE frames (<200 B)
+        # compress to roughly their own size, so deflate costs CPU without
+        # saving bytes there. Uvicorn has no per-frame size threshold, so
+        # the lever is the whole flag: set WS_DEFLATE=0 on deployments where
+        # connection count (deflate holds ~50 KiB of zlib state per socket)
+        # or small-frame CPU dominates over SDP bandwidth.
+        ws="websockets",
+        ws_per_message_deflate=os.getenv("WS_DEFLATE", "1") == "1",
+        # The limit is server-wide and /ws-demo/ws/call also carries
+        # media_chunk frames (base64 MediaRecorder blobs easily exceed
+        # 64 KiB), so the cap must cover those, not just signaling. 8 MiB
+        # still bounds hostile frames well under uvicorn's 16 MiB default.
+        ws_max_size=int(os.getenv("WS_MAX_SIZE", 8 * 1024 * 1024)),
+    )